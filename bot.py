@@ -13,11 +13,15 @@ Run:
 1) pip install aiogram==2.*
 2) Set TOKEN and ADMIN_ID below (or via env vars)
 3) python bot.py
+4) Optional: set WEBHOOK_HOST to a public https URL to receive updates over a
+   webhook instead of long-polling; install uvloop for a faster event loop
 """
 
+import asyncio
 import os
+import re
 import sqlite3
-from contextlib import closing
+import threading
 from typing import Optional, List, Tuple
 
 from aiogram import Bot, Dispatcher, types
@@ -29,183 +33,461 @@ from aiogram.utils import executor
 from aiogram.dispatcher import FSMContext
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
 from aiogram.dispatcher.filters.state import State, StatesGroup
-from aiogram.dispatcher.filters import Text
+from aiogram.dispatcher.handler import CancelHandler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass  # optional speed-up; stock asyncio works fine
 
 # ---------------------- CONFIG ----------------------
 TOKEN = os.getenv("BOT_TOKEN", "PUT_YOUR_TOKEN")
-ADMIN_ID = int(os.getenv("ADMIN_ID", "PUT_YOUR_OWNER_ID)  # replace with your Telegram user ID
+ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))  # replace with your Telegram user ID
 DB_PATH = os.getenv("DB_PATH", "bot.db")
 
-# ---------------------- DB LAYER ----------------------
-
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+# Webhook mode: set WEBHOOK_HOST to the public https base URL (e.g. behind a
+# reverse proxy) and Telegram pushes updates instead of the bot long-polling
+# getUpdates; leave it unset to keep polling for local runs.
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/tg")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8443"))
 
+# ---------------------- DB LAYER ----------------------
 
-def init_db():
-    with closing(get_db()) as db:
-        db.executescript(
+# One process-wide connection: opening/closing a connection per query costs
+# several syscalls plus a WAL header read, and the bot issues a handful of
+# queries per button tap. sqlite3 connections are safe to share across threads
+# with check_same_thread=False as long as writes are serialized, which _LOCK does.
+_CONN: Optional[sqlite3.Connection] = None
+_LOCK = threading.Lock()
+
+
+def get_db() -> sqlite3.Connection:
+    """Return the shared connection, opening it on first use.
+
+    Statement reuse comes for free with this connection: sqlite3 keeps an
+    LRU cache of parsed statements per connection keyed by the SQL text, so
+    as long as the helpers below pass the same string literals through
+    Connection.execute, the query planner runs once per process instead of
+    once per call. Keep query strings as literals (parameters via ?) so
+    they stay cache-hits.
+    """
+    global _CONN
+    if _CONN is None:
+        _CONN = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+        _CONN.row_factory = sqlite3.Row
+        _CONN.executescript(
             """
-            CREATE TABLE IF NOT EXISTS sections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                parent_id INTEGER NULL REFERENCES sections(id) ON DELETE CASCADE,
-                position INTEGER DEFAULT 0
-            );
-
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                section_id INTEGER NOT NULL REFERENCES sections(id) ON DELETE CASCADE,
-                type TEXT NOT NULL CHECK (type IN ('text','photo','document','video','audio','animation')),
-                text TEXT,
-                file_id TEXT,
-                caption TEXT,
-                position INTEGER DEFAULT 0
-            );
-
-            CREATE INDEX IF NOT EXISTS idx_sections_parent ON sections(parent_id);
-            CREATE INDEX IF NOT EXISTS idx_items_section ON items(section_id);
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-64000;
+            PRAGMA foreign_keys=ON;
             """
         )
-        db.commit()
+    return _CONN
 
 
-def fetch_sections(parent_id: Optional[int]) -> List[sqlite3.Row]:
-    with closing(get_db()) as db:
-        cur = db.execute(
-            "SELECT * FROM sections WHERE parent_id IS ? ORDER BY position, id",
-            (parent_id,)
-        )
-        return cur.fetchall()
+def init_db():
+    get_db().executescript(
+        """
+        CREATE TABLE IF NOT EXISTS sections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            parent_id INTEGER NULL REFERENCES sections(id) ON DELETE CASCADE,
+            position INTEGER DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            section_id INTEGER NOT NULL REFERENCES sections(id) ON DELETE CASCADE,
+            type TEXT NOT NULL CHECK (type IN ('text','photo','document','video','audio','animation')),
+            text TEXT,
+            file_id TEXT,
+            caption TEXT,
+            position INTEGER DEFAULT 0
+        );
+
+        -- Composite on the full filter+order so ORDER BY position, id comes
+        -- straight off the B-tree with no sort step; the old single-column
+        -- indexes are subsumed and dropped on databases that predate this.
+        CREATE INDEX IF NOT EXISTS idx_sections_parent_pos ON sections(parent_id, position, id);
+        CREATE INDEX IF NOT EXISTS idx_items_section_pos ON items(section_id, position, id);
+        DROP INDEX IF EXISTS idx_sections_parent;
+        DROP INDEX IF EXISTS idx_items_section;
+        """
+    )
 
 
-def fetch_section(section_id: int) -> Optional[sqlite3.Row]:
-    with closing(get_db()) as db:
-        cur = db.execute("SELECT * FROM sections WHERE id=?", (section_id,))
-        return cur.fetchone()
+def _sync_fetch_sections(parent_id: Optional[int]) -> List[sqlite3.Row]:
+    cur = get_db().execute(
+        "SELECT * FROM sections WHERE parent_id IS ? ORDER BY position, id",
+        (parent_id,)
+    )
+    return cur.fetchall()
+
+
+def _sync_fetch_section(section_id: int) -> Optional[sqlite3.Row]:
+    cur = get_db().execute("SELECT * FROM sections WHERE id=?", (section_id,))
+    return cur.fetchone()
+
+
+# The whole parent-pointer column mirrored in RAM: back-button targets are
+# pure tree traversal, so resolve them from a {id: parent_id} dict instead of
+# chasing parent rows through SQL one query at a time. Built lazily from one
+# SELECT and dropped on section writes, like the other caches here.
+_PARENTS: Optional[dict] = None
+
+
+def _sync_parent_of(section_id: int) -> Optional[int]:
+    global _PARENTS
+    if _PARENTS is None:
+        _PARENTS = {
+            row[0]: row[1]
+            for row in get_db().execute("SELECT id, parent_id FROM sections")
+        }
+    return _PARENTS.get(section_id)
+
+
+def _sync_fetch_section_tree() -> List[sqlite3.Row]:
+    """Return all sections in depth-first order with a depth column.
+
+    One recursive CTE instead of one query per node; the zero-padded
+    position path keeps siblings in the same order fetch_sections uses.
+    """
+    cur = get_db().execute(
+        """
+        WITH RECURSIVE t(id, name, parent_id, depth, path) AS (
+            SELECT id, name, parent_id, 0, printf('%08d%08d', position, id)
+            FROM sections WHERE parent_id IS NULL
+            UNION ALL
+            SELECT s.id, s.name, s.parent_id, t.depth + 1,
+                   t.path || '/' || printf('%08d%08d', s.position, s.id)
+            FROM sections s JOIN t ON s.parent_id = t.id
+        )
+        SELECT id, name, parent_id, depth FROM t ORDER BY path
+        """
+    )
+    return cur.fetchall()
 
 
-def add_section(name: str, parent_id: Optional[int]) -> int:
-    with closing(get_db()) as db:
-        cur = db.execute(
+def _sync_add_section(name: str, parent_id: Optional[int]) -> int:
+    with _LOCK:
+        cur = get_db().execute(
             "INSERT INTO sections(name, parent_id, position) VALUES (?,?,?)",
             (name, parent_id, 0)
         )
-        db.commit()
-        return cur.lastrowid
+    _invalidate_kb_cache()
+    if _PARENTS is not None:
+        _PARENTS[cur.lastrowid] = parent_id
+    return cur.lastrowid
 
 
-def rename_section(section_id: int, new_name: str) -> None:
-    with closing(get_db()) as db:
-        db.execute("UPDATE sections SET name=? WHERE id=?", (new_name, section_id))
-        db.commit()
+def _sync_rename_section(section_id: int, new_name: str) -> None:
+    with _LOCK:
+        get_db().execute("UPDATE sections SET name=? WHERE id=?", (new_name, section_id))
+    _invalidate_kb_cache()
 
 
-def delete_section(section_id: int) -> None:
-    with closing(get_db()) as db:
-        db.execute("DELETE FROM sections WHERE id=?", (section_id,))
-        db.commit()
+def _sync_delete_section(section_id: int) -> None:
+    global _PARENTS
+    with _LOCK:
+        get_db().execute("DELETE FROM sections WHERE id=?", (section_id,))
+    _invalidate_kb_cache()
+    _ITEM_COUNTS.clear()
+    # Rebuild lazily rather than walking the deleted subtree out of the map
+    _PARENTS = None
 
 
-def fetch_items(section_id: int) -> List[sqlite3.Row]:
-    with closing(get_db()) as db:
-        cur = db.execute(
-            "SELECT * FROM items WHERE section_id=? ORDER BY position, id",
-            (section_id,)
-        )
-        return cur.fetchall()
+# Per-section item totals, so page turns don't re-count; dropped on any write
+# that can change them (add_item for the one section, delete_section for all,
+# since a cascade can empty sections anywhere under the deleted subtree).
+_ITEM_COUNTS: dict = {}
+
 
+def _sync_count_items(section_id: int) -> int:
+    total = _ITEM_COUNTS.get(section_id)
+    if total is None:
+        cur = get_db().execute("SELECT COUNT(*) FROM items WHERE section_id=?", (section_id,))
+        total = _ITEM_COUNTS[section_id] = cur.fetchone()[0]
+    return total
 
-def fetch_item_page(section_id: int, page: int) -> Tuple[Optional[sqlite3.Row], int]:
-    items = fetch_items(section_id)
-    total = len(items)
+
+def _sync_fetch_item_page(section_id: int, page: int) -> Tuple[Optional[sqlite3.Row], int]:
+    """Fetch one page without materializing the whole section.
+
+    The old version pulled every item into Python and indexed into the
+    list, allocating O(N) rows per page turn; LIMIT/OFFSET keeps it at one
+    row regardless of section size.
+    """
+    total = _sync_count_items(section_id)
     if total == 0:
         return None, 0
     page = max(0, min(page, total - 1))
-    return items[page], total
+    cur = get_db().execute(
+        "SELECT * FROM items WHERE section_id=? ORDER BY position, id LIMIT 1 OFFSET ?",
+        (section_id, page)
+    )
+    return cur.fetchone(), total
 
 
-def add_item(section_id: int, type_: str, text: Optional[str], file_id: Optional[str], caption: Optional[str]) -> int:
-    with closing(get_db()) as db:
-        cur = db.execute(
+def _sync_add_item(section_id: int, type_: str, text: Optional[str], file_id: Optional[str], caption: Optional[str]) -> int:
+    with _LOCK:
+        cur = get_db().execute(
             "INSERT INTO items(section_id, type, text, file_id, caption, position) VALUES (?,?,?,?,?,0)",
             (section_id, type_, text, file_id, caption)
         )
-        db.commit()
-        return cur.lastrowid
+    _ITEM_COUNTS.pop(section_id, None)
+    return cur.lastrowid
+
+
+def _sync_add_items_bulk(rows: List[Tuple]) -> None:
+    """Insert many (section_id, type, text, file_id, caption) rows at once.
+
+    Single writes ride the connection's autocommit (one WAL append each,
+    fsync deferred to checkpoints by synchronous=NORMAL); a batch would
+    still pay a commit per row, so this wraps one executemany in one
+    explicit transaction. BEGIN IMMEDIATE takes the write lock up front
+    rather than upgrading mid-batch.
+    """
+    if not rows:
+        return
+    with _LOCK:
+        db = get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT INTO items(section_id, type, text, file_id, caption, position) VALUES (?,?,?,?,?,0)",
+                rows
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+    for row in rows:
+        _ITEM_COUNTS.pop(row[0], None)
+
+
+def _sync_find_section_by_name(name: str) -> Optional[int]:
+    cur = get_db().execute("SELECT id FROM sections WHERE name=? ORDER BY id LIMIT 1", (name,))
+    row = cur.fetchone()
+    return row["id"] if row else None
+
+
+# Async facade over the sync helpers above: sqlite3 blocks, and a query run
+# directly in a handler stalls the event loop for every other chat. Each call
+# hops to the default thread pool; with the persistent connection each query
+# is sub-millisecond, so pool contention stays negligible.
+
+async def fetch_sections(parent_id: Optional[int]) -> List[sqlite3.Row]:
+    return await asyncio.to_thread(_sync_fetch_sections, parent_id)
+
+
+async def fetch_section(section_id: int) -> Optional[sqlite3.Row]:
+    return await asyncio.to_thread(_sync_fetch_section, section_id)
+
+
+async def fetch_section_tree() -> List[sqlite3.Row]:
+    return await asyncio.to_thread(_sync_fetch_section_tree)
+
+
+async def add_section(name: str, parent_id: Optional[int]) -> int:
+    return await asyncio.to_thread(_sync_add_section, name, parent_id)
+
+
+async def rename_section(section_id: int, new_name: str) -> None:
+    await asyncio.to_thread(_sync_rename_section, section_id, new_name)
+
+
+async def delete_section(section_id: int) -> None:
+    await asyncio.to_thread(_sync_delete_section, section_id)
+
+
+async def fetch_item_page(section_id: int, page: int) -> Tuple[Optional[sqlite3.Row], int]:
+    return await asyncio.to_thread(_sync_fetch_item_page, section_id, page)
+
+
+async def add_item(section_id: int, type_: str, text: Optional[str], file_id: Optional[str], caption: Optional[str]) -> int:
+    return await asyncio.to_thread(_sync_add_item, section_id, type_, text, file_id, caption)
+
+
+async def add_items_bulk(rows: List[Tuple]) -> None:
+    await asyncio.to_thread(_sync_add_items_bulk, rows)
+
+
+async def find_section_by_name(name: str) -> Optional[int]:
+    return await asyncio.to_thread(_sync_find_section_by_name, name)
 
 # ---------------------- BOT SETUP ----------------------
 
 bot = Bot(TOKEN, parse_mode="HTML")
 dp = Dispatcher(bot, storage=MemoryStorage())
 
+# ---------------------- PER-CHAT DISPATCH QUEUES ----------------------
+
+# aiogram v2 dispatch gives no ordering or isolation guarantees across chats:
+# a slow handler in one chat (say, a video upload) can hold up callbacks from
+# everyone else. Each chat gets its own bounded queue and worker task, so
+# processing is concurrent across chats but stays ordered within a chat. The
+# bound applies backpressure when a chat's handlers fall behind its taps.
+
+_CHAT_QUEUE_SIZE = 20
+_chat_queues: dict = {}
+_chat_workers: dict = {}
+
+
+def _update_chat_id(update: types.Update) -> Optional[int]:
+    if update.message:
+        return update.message.chat.id
+    if update.edited_message:
+        return update.edited_message.chat.id
+    if update.callback_query:
+        msg = update.callback_query.message
+        return msg.chat.id if msg else update.callback_query.from_user.id
+    return None
+
+
+async def _chat_worker(queue: asyncio.Queue) -> None:
+    while True:
+        update = await queue.get()
+        try:
+            # process_update routes straight to the handlers; it does not
+            # re-enter the update middleware, so no loop guard is needed.
+            await dp.process_update(update)
+        except Exception:
+            pass  # errors already went through dp's errors_handler
+        finally:
+            queue.task_done()
+
+
+class ChatQueueMiddleware(BaseMiddleware):
+    async def on_pre_process_update(self, update: types.Update, data: dict):
+        chat_id = _update_chat_id(update)
+        if chat_id is None:
+            return  # no chat to shard on — let aiogram handle it inline
+        queue = _chat_queues.get(chat_id)
+        if queue is None:
+            queue = _chat_queues[chat_id] = asyncio.Queue(maxsize=_CHAT_QUEUE_SIZE)
+            _chat_workers[chat_id] = asyncio.create_task(_chat_worker(queue))
+        await queue.put(update)
+        raise CancelHandler()
+
+
+dp.middleware.setup(ChatQueueMiddleware())
+
 # ---------------------- KEYBOARDS ----------------------
 
-HOME_BTN = InlineKeyboardButton("🏠 الرئيسية", callback_data="home")
-BACK_PREFIX = "back:"  # back:<parent_id or 'root'>
+# Callback-data vocabulary: single-byte opcodes followed by the payload.
+# Telegram caps callback_data at 64 bytes per button and every keyboard ships
+# dozens of them in each edit, so "S123" instead of "section:123" roughly
+# halves the JSON the bot pushes and receives per tap. The router dispatches
+# on the first byte after checking the payload shape; anything that doesn't
+# match a known opcode and shape — including buttons from menus sent before
+# this encoding, some of which collide on the first byte (legacy "section:12"
+# starts with the show opcode) — gets the stale-menu answer instead.
+CB_HOME = "h"
+CB_NOOP = "n"
+SECTION_PREFIX = "S"      # S<id>
+SHOW_PREFIX = "s"         # s<section_id>:<page>
+BACK_PREFIX = "b"         # b<parent_id or 'root'>
+ADMIN_ADD_SECTION_PREFIX = "A"  # A<parent_id or 'root' or 'pick'>
+ADMIN_RENAME_PREFIX = "R"       # R<id or 'pick'>
+ADMIN_DELETE_PREFIX = "D"       # D<id or 'pick'>
+ADMIN_ADD_ITEM_PREFIX = "I"     # I<id or 'pick'>
 
+HOME_BTN = InlineKeyboardButton("🏠 الرئيسية", callback_data=CB_HOME)
 
-def build_sections_kb(parent_id: Optional[int]) -> InlineKeyboardMarkup:
-    kb = InlineKeyboardMarkup(row_width=2)
-    sections = fetch_sections(parent_id)
-    for s in sections:
-        kb.insert(InlineKeyboardButton(f"📂 {s['name']}", callback_data=f"section:{s['id']}"))
+# Menus are read far more often than they change, so cache the rendered
+# keyboards and rebuild only after an admin edits the tree. Keyboards are
+# mutable, so the cache holds the serialized dict and each hit reconstructs
+# a fresh markup from it — still O(buttons), but with zero DB round-trips.
+_KB_CACHE: dict = {}
+
+
+async def _cached_kb(key, build, *args) -> InlineKeyboardMarkup:
+    cached = _KB_CACHE.get(key)
+    if cached is None:
+        # Cache miss: the builder does the SQL work, so run it off-loop too
+        cached = _KB_CACHE[key] = (await asyncio.to_thread(build, *args)).to_python()
+    return InlineKeyboardMarkup(**cached)
+
+
+def _invalidate_kb_cache() -> None:
+    _KB_CACHE.clear()
+
+
+async def build_sections_kb(parent_id: Optional[int]) -> InlineKeyboardMarkup:
+    return await _cached_kb(("sections", parent_id), _build_sections_kb, parent_id)
+
+
+async def build_section_view_kb(section_id: int, parent_id: Optional[int]) -> InlineKeyboardMarkup:
+    return await _cached_kb(("view", section_id, parent_id), _build_section_view_kb, section_id, parent_id)
+
+
+def _rows(buttons: List[InlineKeyboardButton], width: int) -> List[List[InlineKeyboardButton]]:
+    """Split a flat button list into rows of `width`, like kb.insert would,
+    but without per-button row bookkeeping."""
+    return [buttons[i:i + width] for i in range(0, len(buttons), width)]
+
+
+def _build_sections_kb(parent_id: Optional[int]) -> InlineKeyboardMarkup:
+    rows = _rows([
+        InlineKeyboardButton(f"📂 {s['name']}", callback_data=f"{SECTION_PREFIX}{s['id']}")
+        for s in _sync_fetch_sections(parent_id)
+    ], width=2)
     # Admin add-section shortcut
-    kb.add(InlineKeyboardButton("➕ إضافة قسم", callback_data=f"admin:add_section:{parent_id if parent_id is not None else 'root'}"))
+    rows.append([InlineKeyboardButton("➕ إضافة قسم", callback_data=f"{ADMIN_ADD_SECTION_PREFIX}{parent_id if parent_id is not None else 'root'}")])
 
     # Nav row
     if parent_id is None:
-        kb.add(HOME_BTN)  # home = main
+        rows.append([HOME_BTN])  # home = main
     else:
-        kb.add(InlineKeyboardButton("⬅️ رجوع", callback_data=f"{BACK_PREFIX}{'root' if fetch_section(parent_id)['parent_id'] is None else fetch_section(parent_id)['parent_id']}"), HOME_BTN)
-    return kb
+        back_id = _sync_parent_of(parent_id)
+        rows.append([InlineKeyboardButton("⬅️ رجوع", callback_data=f"{BACK_PREFIX}{'root' if back_id is None else back_id}"), HOME_BTN])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-def build_section_view_kb(section_id: int, parent_id: Optional[int]) -> InlineKeyboardMarkup:
-    kb = InlineKeyboardMarkup(row_width=2)
+def _build_section_view_kb(section_id: int, parent_id: Optional[int]) -> InlineKeyboardMarkup:
     # Subsections
-    subsections = fetch_sections(section_id)
-    for s in subsections:
-        kb.insert(InlineKeyboardButton(f"📂 {s['name']}", callback_data=f"section:{s['id']}"))
+    rows = _rows([
+        InlineKeyboardButton(f"📂 {s['name']}", callback_data=f"{SECTION_PREFIX}{s['id']}")
+        for s in _sync_fetch_sections(section_id)
+    ], width=2)
 
     # Content navigation entry point
-    kb.add(InlineKeyboardButton("▶️ عرض المحتوى", callback_data=f"show:{section_id}:0"))
+    rows.append([InlineKeyboardButton("▶️ عرض المحتوى", callback_data=f"{SHOW_PREFIX}{section_id}:0")])
 
     # Admin tools for this section
-    kb.add(
-        InlineKeyboardButton("✏️ إعادة تسمية", callback_data=f"admin:rename:{section_id}"),
-        InlineKeyboardButton("🗑 حذف", callback_data=f"admin:delete:{section_id}")
-    )
-    kb.add(InlineKeyboardButton("➕ إضافة عنصر لهذا القسم", callback_data=f"admin:add_item:{section_id}"))
+    rows.append([
+        InlineKeyboardButton("✏️ إعادة تسمية", callback_data=f"{ADMIN_RENAME_PREFIX}{section_id}"),
+        InlineKeyboardButton("🗑 حذف", callback_data=f"{ADMIN_DELETE_PREFIX}{section_id}")
+    ])
+    rows.append([InlineKeyboardButton("➕ إضافة عنصر لهذا القسم", callback_data=f"{ADMIN_ADD_ITEM_PREFIX}{section_id}")])
 
     # Nav row
     if parent_id is None:
-        kb.add(HOME_BTN)
+        rows.append([HOME_BTN])
     else:
-        kb.add(InlineKeyboardButton("⬅️ رجوع", callback_data=f"{BACK_PREFIX}{parent_id}"), HOME_BTN)
+        rows.append([InlineKeyboardButton("⬅️ رجوع", callback_data=f"{BACK_PREFIX}{parent_id}"), HOME_BTN])
 
-    return kb
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 def build_items_nav_kb(section_id: int, page: int, total: int, parent_id: Optional[int]) -> InlineKeyboardMarkup:
-    kb = InlineKeyboardMarkup(row_width=3)
     prev_page = max(0, page - 1)
     next_page = min(total - 1, page + 1)
-    kb.add(
-        InlineKeyboardButton("⏮", callback_data=f"show:{section_id}:0"),
-        InlineKeyboardButton("◀️", callback_data=f"show:{section_id}:{prev_page}"),
-        InlineKeyboardButton(f"{page+1}/{total}", callback_data="noop"),
-        InlineKeyboardButton("▶️", callback_data=f"show:{section_id}:{next_page}"),
-        InlineKeyboardButton("⏭", callback_data=f"show:{section_id}:{total-1}")
-    )
-    if parent_id is None:
-        kb.add(InlineKeyboardButton("⬅️ رجوع", callback_data=f"section:{section_id}"), HOME_BTN)
-    else:
-        kb.add(InlineKeyboardButton("⬅️ رجوع", callback_data=f"section:{section_id}"), HOME_BTN)
-    return kb
+    rows = _rows([
+        InlineKeyboardButton("⏮", callback_data=f"{SHOW_PREFIX}{section_id}:0"),
+        InlineKeyboardButton("◀️", callback_data=f"{SHOW_PREFIX}{section_id}:{prev_page}"),
+        InlineKeyboardButton(f"{page+1}/{total}", callback_data=CB_NOOP),
+        InlineKeyboardButton("▶️", callback_data=f"{SHOW_PREFIX}{section_id}:{next_page}"),
+        InlineKeyboardButton("⏭", callback_data=f"{SHOW_PREFIX}{section_id}:{total-1}")
+    ], width=3)
+    rows.append([InlineKeyboardButton("⬅️ رجوع", callback_data=f"{SECTION_PREFIX}{section_id}"), HOME_BTN])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 # ---------------------- FSM STATES ----------------------
 
@@ -216,6 +498,9 @@ class AddSectionSG(StatesGroup):
 class RenameSectionSG(StatesGroup):
     waiting_for_name = State()
 
+class DeleteSectionSG(StatesGroup):
+    waiting_for_id = State()
+
 class AddItemSG(StatesGroup):
     waiting_for_section = State()
     waiting_for_item = State()
@@ -226,6 +511,26 @@ def is_admin(user_id: int) -> bool:
     return user_id == ADMIN_ID
 
 
+# Telegram keeps a spinner on the pressed button until answerCallbackQuery
+# arrives, so acknowledge in the background while the handler does its DB and
+# edit work instead of after. Tasks are kept in a set until done so they are
+# not garbage-collected mid-flight.
+_ACK_TASKS: set = set()
+
+
+async def _answer_quiet(call: types.CallbackQuery) -> None:
+    try:
+        await call.answer()
+    except Exception:
+        pass  # already answered or expired — nothing to clear
+
+
+def ack(call: types.CallbackQuery) -> None:
+    task = asyncio.create_task(_answer_quiet(call))
+    _ACK_TASKS.add(task)
+    task.add_done_callback(_ACK_TASKS.discard)
+
+
 async def ensure_admin(call_or_msg):
     uid = call_or_msg.from_user.id
     if not is_admin(uid):
@@ -240,72 +545,95 @@ async def ensure_admin(call_or_msg):
 
 @dp.message_handler(commands=["start", "menu", "home"])
 async def cmd_start(message: types.Message):
-    init_db()
     await message.answer("📌 القائمة الرئيسية:", reply_markup=ReplyKeyboardRemove())
-    await message.answer("اختر قسمًا:", reply_markup=build_sections_kb(parent_id=None))
+    await message.answer("اختر قسمًا:", reply_markup=await build_sections_kb(parent_id=None))
 
 
-@dp.callback_query_handler(Text(equals="home"))
 async def cb_home(call: types.CallbackQuery):
-    await call.message.edit_text("📌 القائمة الرئيسية:")
-    await call.message.edit_reply_markup(build_sections_kb(parent_id=None))
+    ack(call)
+    await call.message.edit_text("📌 القائمة الرئيسية:", reply_markup=await build_sections_kb(parent_id=None))
 
 
-@dp.callback_query_handler(Text(startswith=BACK_PREFIX))
 async def cb_back(call: types.CallbackQuery):
-    target = call.data.split(":", 1)[1]
+    ack(call)
+    target = call.data[1:]
     parent_id = None if target == "root" else int(target)
     if parent_id is None:
         await cb_home(call)
     else:
-        parent = fetch_section(parent_id)
+        parent = await fetch_section(parent_id)
         if not parent:
             await cb_home(call)
             return
         # parent of parent for the next back
-        await call.message.edit_text(f"📂 {parent['name']}")
-        await call.message.edit_reply_markup(build_section_view_kb(parent_id, parent['parent_id']))
+        await call.message.edit_text(f"📂 {parent['name']}", reply_markup=await build_section_view_kb(parent_id, parent['parent_id']))
 
 
-@dp.callback_query_handler(Text(startswith="section:"))
 async def cb_open_section(call: types.CallbackQuery):
-    section_id = int(call.data.split(":")[1])
-    section = fetch_section(section_id)
+    section_id = int(call.data[1:])
+    section = await fetch_section(section_id)
     if not section:
         await call.answer("⚠️ القسم غير موجود")
         return
-    await call.message.edit_text(f"📂 <b>{section['name']}</b>")
-    await call.message.edit_reply_markup(build_section_view_kb(section_id, section['parent_id']))
+    ack(call)
+    await call.message.edit_text(f"📂 <b>{section['name']}</b>", reply_markup=await build_section_view_kb(section_id, section['parent_id']))
+
+
+# Paging through media used to send a fresh message per page, growing the chat
+# and paying a full upload-sized POST each time. Remember the media message per
+# (chat, section) and swap its content with editMessageMedia instead; text
+# items and edit failures (message deleted, text/media mismatch) fall back to
+# a plain resend.
+_INPUT_MEDIA = {
+    "photo": types.InputMediaPhoto,
+    "document": types.InputMediaDocument,
+    "video": types.InputMediaVideo,
+    "audio": types.InputMediaAudio,
+    "animation": types.InputMediaAnimation,
+}
+_last_media_msg: dict = {}  # (chat_id, section_id) -> message_id
+
+
+async def _show_item(message: types.Message, section_id: int, item: sqlite3.Row) -> None:
+    key = (message.chat.id, section_id)
+    if item["type"] == "text":
+        _last_media_msg.pop(key, None)
+        await message.answer(item["text"] or "")
+        return
+
+    media = _INPUT_MEDIA[item["type"]](media=item["file_id"], caption=item["caption"], parse_mode="HTML")
+    msg_id = _last_media_msg.get(key)
+    if msg_id is not None:
+        try:
+            await bot.edit_message_media(media, chat_id=message.chat.id, message_id=msg_id)
+            return
+        except Exception:
+            _last_media_msg.pop(key, None)
+    sender = getattr(message, f"answer_{item['type']}")
+    sent = await sender(item["file_id"], caption=item["caption"])
+    _last_media_msg[key] = sent.message_id
 
 
-@dp.callback_query_handler(Text(startswith="show:"))
 async def cb_show_item(call: types.CallbackQuery):
-    _, sid, page_str = call.data.split(":")
+    sid, page_str = call.data[1:].split(":")
     section_id = int(sid)
     page = int(page_str)
-    item, total = fetch_item_page(section_id, page)
-    section = fetch_section(section_id)
+    item, total = await fetch_item_page(section_id, page)
+    section = await fetch_section(section_id)
     if total == 0:
         await call.answer("لا يوجد محتوى في هذا القسم بعد")
         return
+    ack(call)
 
     # Replace current message with placeholder (to keep nav in one place)
-    await call.message.edit_text(f"📂 <b>{section['name']}</b> — عنصر {page+1}/{total}")
-    await call.message.edit_reply_markup(build_items_nav_kb(section_id, page, total, section['parent_id']))
+    await call.message.edit_text(
+        f"📂 <b>{section['name']}</b> — عنصر {page+1}/{total}",
+        reply_markup=build_items_nav_kb(section_id, page, total, section['parent_id'])
+    )
 
-    # Then send the actual item as a new message underneath
-    if item["type"] == "text":
-        await call.message.answer(item["text"] or "")
-    elif item["type"] == "photo":
-        await call.message.answer_photo(item["file_id"], caption=item["caption"])
-    elif item["type"] == "document":
-        await call.message.answer_document(item["file_id"], caption=item["caption"])
-    elif item["type"] == "video":
-        await call.message.answer_video(item["file_id"], caption=item["caption"])
-    elif item["type"] == "audio":
-        await call.message.answer_audio(item["file_id"], caption=item["caption"])
-    elif item["type"] == "animation":
-        await call.message.answer_animation(item["file_id"], caption=item["caption"])
+    # Then show the actual item underneath: edit the previous media message
+    # in place when there is one, otherwise send it once and remember its id
+    await _show_item(call.message, section_id, item)
 
 
 # ---------------------- HANDLERS (ADMIN) ----------------------
@@ -316,20 +644,20 @@ async def cmd_admin(message: types.Message):
         return
     kb = InlineKeyboardMarkup(row_width=2)
     kb.add(
-        InlineKeyboardButton("➕ إضافة قسم", callback_data="admin:add_section:root"),
-        InlineKeyboardButton("✏️ إعادة تسمية قسم", callback_data="admin:rename:pick"),
-        InlineKeyboardButton("🗑 حذف قسم", callback_data="admin:delete:pick"),
-        InlineKeyboardButton("➕ إضافة عنصر لمحتوى قسم", callback_data="admin:add_item:pick"),
+        InlineKeyboardButton("➕ إضافة قسم", callback_data=ADMIN_ADD_SECTION_PREFIX + "root"),
+        InlineKeyboardButton("✏️ إعادة تسمية قسم", callback_data=ADMIN_RENAME_PREFIX + "pick"),
+        InlineKeyboardButton("🗑 حذف قسم", callback_data=ADMIN_DELETE_PREFIX + "pick"),
+        InlineKeyboardButton("➕ إضافة عنصر لمحتوى قسم", callback_data=ADMIN_ADD_ITEM_PREFIX + "pick"),
     )
     await message.answer("🛠 لوحة تحكم الأدمن:", reply_markup=kb)
 
 
 # ---- Add Section ----
-@dp.callback_query_handler(Text(startswith="admin:add_section:"))
 async def admin_add_section(call: types.CallbackQuery, state: FSMContext):
     if not await ensure_admin(call):
         return
-    target = call.data.split(":")[-1]
+    ack(call)
+    target = call.data[1:]
     parent_id = None if target == "root" else int(target)
     await state.update_data(parent_id=parent_id)
     await AddSectionSG.waiting_for_name.set()
@@ -342,31 +670,31 @@ async def admin_add_section_name(message: types.Message, state: FSMContext):
         return
     data = await state.get_data()
     parent_id = data.get("parent_id")
-    sid = add_section(message.text.strip(), parent_id)
+    sid = await add_section(message.text.strip(), parent_id)
     await message.answer(f"✅ تم إنشاء القسم: <b>{message.text.strip()}</b>")
     await state.finish()
     # Refresh current menu
     if parent_id is None:
-        await message.answer("📌 القائمة الرئيسية:", reply_markup=build_sections_kb(parent_id=None))
+        await message.answer("📌 القائمة الرئيسية:", reply_markup=await build_sections_kb(parent_id=None))
     else:
-        parent = fetch_section(parent_id)
-        await message.answer(f"📂 {parent['name']}", reply_markup=build_section_view_kb(parent_id, parent['parent_id']))
+        parent = await fetch_section(parent_id)
+        await message.answer(f"📂 {parent['name']}", reply_markup=await build_section_view_kb(parent_id, parent['parent_id']))
 
 
 # ---- Rename Section ----
-@dp.callback_query_handler(Text(startswith="admin:rename:"))
 async def admin_rename_pick(call: types.CallbackQuery, state: FSMContext):
     if not await ensure_admin(call):
         return
-    parts = call.data.split(":")
-    if parts[-1] == "pick":
+    ack(call)
+    target = call.data[1:]
+    if target == "pick":
         # Ask for section id
         await call.message.answer("📌 أرسل رقم معرف القسم (ID) الذي تريد إعادة تسميته.\nيمكنك الحصول على ID بالضغط مطولًا على رسالة عرض القسم (أو أرسل /list لتفاصيل).")
         await RenameSectionSG.waiting_for_name.set()
         await state.update_data(stage="ask_id")
     else:
         # direct rename from a specific section
-        section_id = int(parts[-1])
+        section_id = int(target)
         await state.update_data(section_id=section_id)
         await RenameSectionSG.waiting_for_name.set()
         await call.message.answer("✏️ أرسل الاسم الجديد للقسم:")
@@ -376,14 +704,12 @@ async def admin_rename_pick(call: types.CallbackQuery, state: FSMContext):
 async def cmd_list(message: types.Message):
     if not await ensure_admin(message):
         return
-    # Simple tree dump
-    def dump(parent_id: Optional[int], indent: int) -> List[str]:
-        lines: List[str] = []
-        for s in fetch_sections(parent_id):
-            lines.append("  "*indent + f"- {s['name']} (ID={s['id']})")
-            lines.extend(dump(s['id'], indent+1))
-        return lines
-    tree = "\n".join(dump(None, 0)) or "(لا توجد أقسام بعد)"
+    # Simple tree dump — one recursive query instead of one per node
+    lines = [
+        "  " * s["depth"] + f"- {s['name']} (ID={s['id']})"
+        for s in await fetch_section_tree()
+    ]
+    tree = "\n".join(lines) or "(لا توجد أقسام بعد)"
     await message.answer(f"<pre>{tree}</pre>")
 
 
@@ -399,7 +725,7 @@ async def admin_rename_section(message: types.Message, state: FSMContext):
         except ValueError:
             await message.answer("❌ أرسل رقمًا صحيحًا للـ ID.")
             return
-        sec = fetch_section(section_id)
+        sec = await fetch_section(section_id)
         if not sec:
             await message.answer("⚠️ قسم غير موجود.")
             return
@@ -409,27 +735,28 @@ async def admin_rename_section(message: types.Message, state: FSMContext):
 
     section_id = data.get("section_id")
     new_name = message.text.strip()
-    rename_section(section_id, new_name)
+    await rename_section(section_id, new_name)
     await state.finish()
     await message.answer("✅ تم التحديث.")
 
 
 # ---- Delete Section ----
-@dp.callback_query_handler(Text(startswith="admin:delete:"))
-async def admin_delete_section(call: types.CallbackQuery):
+async def admin_delete_section(call: types.CallbackQuery, state: FSMContext):
     if not await ensure_admin(call):
         return
-    target = call.data.split(":")[-1]
+    ack(call)
+    target = call.data[1:]
     if target == "pick":
+        await DeleteSectionSG.waiting_for_id.set()
         await call.message.answer("🗑 أرسل ID القسم الذي تريد حذفه (يحذف محتواه وكل فروعه):")
-        dp.register_message_handler(admin_delete_receive_id, content_types=types.ContentTypes.TEXT, state=None)
     else:
         section_id = int(target)
-        delete_section(section_id)
+        await delete_section(section_id)
         await call.message.answer("✅ تم حذف القسم.")
 
 
-async def admin_delete_receive_id(message: types.Message):
+@dp.message_handler(state=DeleteSectionSG.waiting_for_id)
+async def admin_delete_receive_id(message: types.Message, state: FSMContext):
     if not await ensure_admin(message):
         return
     try:
@@ -437,18 +764,17 @@ async def admin_delete_receive_id(message: types.Message):
     except ValueError:
         await message.answer("❌ أرسل رقم ID صحيح.")
         return
-    delete_section(sid)
+    await delete_section(sid)
+    await state.finish()
     await message.answer("✅ تم الحذف.")
-    # Unregister this ad-hoc handler
-    dp.message_handlers.unregister(admin_delete_receive_id)
 
 
 # ---- Add Item ----
-@dp.callback_query_handler(Text(startswith="admin:add_item:"))
 async def admin_add_item(call: types.CallbackQuery, state: FSMContext):
     if not await ensure_admin(call):
         return
-    target = call.data.split(":")[-1]
+    ack(call)
+    target = call.data[1:]
     if target == "pick":
         await call.message.answer("📌 أرسل ID القسم الذي تريد الإضافة إليه (أو اكتب اسمه بالضبط):")
         await AddItemSG.waiting_for_section.set()
@@ -470,12 +796,8 @@ async def admin_add_item_pick_section(message: types.Message, state: FSMContext)
         sid = int(text)
     except ValueError:
         # Try by exact name at any depth (first match)
-        with closing(get_db()) as db:
-            cur = db.execute("SELECT id FROM sections WHERE name=? ORDER BY id LIMIT 1", (text,))
-            row = cur.fetchone()
-            if row:
-                sid = row["id"]
-    if sid is None or not fetch_section(sid):
+        sid = await find_section_by_name(text)
+    if sid is None or not await fetch_section(sid):
         await message.answer("⚠️ قسم غير موجود. أعد المحاولة بإرسال ID أو اسم مطابق.")
         return
     await state.update_data(section_id=sid)
@@ -522,18 +844,71 @@ async def admin_add_item_receive(message: types.Message, state: FSMContext):
         await message.answer("⚠️ نوع غير مدعوم حاليًا.")
         return
 
-    add_item(section_id, type_, text, file_id, caption)
+    await add_item(section_id, type_, text, file_id, caption)
     await state.finish()
     await message.answer("✅ تم إضافة العنصر إلى القسم.")
 
 
 # ---------------------- FALLBACKS ----------------------
 
-@dp.callback_query_handler(Text(equals="noop"))
 async def cb_noop(call: types.CallbackQuery):
     await call.answer("")
 
 
+# ---------------------- CALLBACK ROUTER ----------------------
+
+# aiogram walks its handler list linearly, testing every filter against each
+# incoming callback. With one registered catch-all that walk has length 1 and
+# the real routing is a dict hit on the opcode byte.
+
+_CB_ROUTES = {
+    CB_HOME: cb_home,
+    BACK_PREFIX: cb_back,
+    SECTION_PREFIX: cb_open_section,
+    SHOW_PREFIX: cb_show_item,
+    CB_NOOP: cb_noop,
+}
+
+_ADMIN_CB_ROUTES = {
+    ADMIN_ADD_SECTION_PREFIX: admin_add_section,
+    ADMIN_RENAME_PREFIX: admin_rename_pick,
+    ADMIN_DELETE_PREFIX: admin_delete_section,
+    ADMIN_ADD_ITEM_PREFIX: admin_add_item,
+}
+
+# Expected payload per opcode. Legacy long-prefix data can collide with an
+# opcode on its first byte ("section:12"/"show:3:0" start with the show
+# opcode, "back:root" with the back opcode) but never parses as one of these
+# shapes, so it's answered as stale instead of reaching a handler that would
+# choke on int() and surface the generic error alert.
+_CB_SHAPES = {
+    CB_HOME: re.compile(r"\Z"),
+    CB_NOOP: re.compile(r"\Z"),
+    SECTION_PREFIX: re.compile(r"\d+\Z"),
+    SHOW_PREFIX: re.compile(r"\d+:\d+\Z"),
+    BACK_PREFIX: re.compile(r"(?:root|\d+)\Z"),
+    ADMIN_ADD_SECTION_PREFIX: re.compile(r"(?:root|\d+)\Z"),
+    ADMIN_RENAME_PREFIX: re.compile(r"(?:pick|\d+)\Z"),
+    ADMIN_DELETE_PREFIX: re.compile(r"(?:pick|\d+)\Z"),
+    ADMIN_ADD_ITEM_PREFIX: re.compile(r"(?:pick|\d+)\Z"),
+}
+
+
+@dp.callback_query_handler()
+async def cb_router(call: types.CallbackQuery, state: FSMContext):
+    op, payload = call.data[:1], call.data[1:]
+    shape = _CB_SHAPES.get(op)
+    if shape is None or not shape.match(payload):
+        # Unknown opcode or malformed payload — a keyboard from an older build
+        await call.answer("القائمة قديمة — أرسل /start للتحديث")
+        return
+    handler = _ADMIN_CB_ROUTES.get(op)
+    if handler:
+        await handler(call, state)
+    else:
+        await _CB_ROUTES[op](call)
+
+
 @dp.errors_handler()
 async def on_error(update, error):
     # Minimal generic error handler
@@ -546,7 +921,26 @@ async def on_error(update, error):
 
 
 # ---------------------- MAIN ----------------------
+async def _on_webhook_startup(dispatcher):
+    await bot.set_webhook(WEBHOOK_HOST + WEBHOOK_PATH)
+
+
+async def _on_webhook_shutdown(dispatcher):
+    await bot.delete_webhook()
+
+
 if __name__ == "__main__":
     init_db()
     print("Bot is running...")
-    executor.start_polling(dp, skip_updates=True)
+    if WEBHOOK_HOST:
+        executor.start_webhook(
+            dp,
+            webhook_path=WEBHOOK_PATH,
+            skip_updates=True,
+            on_startup=_on_webhook_startup,
+            on_shutdown=_on_webhook_shutdown,
+            host=WEBAPP_HOST,
+            port=WEBAPP_PORT,
+        )
+    else:
+        executor.start_polling(dp, skip_updates=True)